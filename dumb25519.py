@@ -4,14 +4,28 @@
 # -- putting this code into production would be dumb
 # -- assuming this code is secure would also be dumb
 
+import heapq
+import mmap
+import os
 import secrets
-from hashlib import blake2s
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b,blake2s
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # Curve parameters
 q = 2**255 - 19
 l = 2**252 + 27742317777372353535851937790883648493
 cofactor = 8
 b = 256 # bit length
+hash_mode = 'legacy' # default hash_to_point mode: 'legacy' or 'elligator2'
+wnaf_window = 5 # default window for Point scalar multiplication
 
 # Internal helper methods
 def exponent(b,e,m):
@@ -21,40 +35,122 @@ def invert(x,p):
     # Assumes `p` is prime
     return exponent(x,p-2,p)
 
+# Invert a list of nonzero values modulo a prime `p` with a single inversion (Montgomery's trick)
+def batch_invert(values,p):
+    scratch = []
+    acc = 1
+    for value in values:
+        if value % p == 0:
+            raise ZeroDivisionError
+        scratch.append(acc)
+        acc = (acc*value) % p
+    acc = invert(acc,p)
+    inverses = [0]*len(values)
+    for i in range(len(values)-1,-1,-1):
+        inverses[i] = (acc*scratch[i]) % p
+        acc = (acc*values[i]) % p
+    return inverses
+
+# Square root of u/v modulo q using a single exponentiation and no inversion
+# Returns x with v*x**2 == u, or None if u/v is not a square
+def sqrt_ratio(u,v):
+    v3 = (v*v*v) % q
+    x = (u*v3*exponent(u*v3*v3*v,(q-5)//8,q)) % q
+    vx2 = (v*x*x) % q
+    if vx2 == u % q:
+        return x
+    if vx2 == -u % q:
+        return (x*I) % q
+    return None
+
+# Recover the even x-coordinate of a curve point from its y-coordinate, or None if there is none
 def xfromy(y):
-    temp = (y*y-1) * invert(d*y*y+1,q)
-    x = exponent(temp,(q+3)//8,q)
-    if (x*x - temp) % q != 0:
-        x = (x*I) % q
-    if x % 2 != 0:
+    x = sqrt_ratio(y*y-1,d*y*y+1)
+    if x is not None and x % 2 != 0:
         x = q-x
     return x
 
-def bit(h,i):
-    return (int(h[i//8]) >> (i%8)) & 1
+# Decode the 32-byte encoding of a curve point into its affine coordinates
+# Raises ValueError if the encoding is not canonical or not on the curve
+def decompress(data):
+    y = int.from_bytes(data,'little')
+    sign = y >> (b-1)
+    y &= (1 << (b-1)) - 1
+    if y >= q:
+        raise ValueError
+    x = xfromy(y)
+    if x is None or (x == 0 and sign):
+        raise ValueError
+    if sign:
+        x = q-x
+    return x,y
+
+# Width-w non-adjacent form of a nonnegative integer, least significant digit first
+# Every nonzero digit is odd and lies in (-2**(w-1),2**(w-1))
+def wnaf(k,w):
+    naf = []
+    while k > 0:
+        if k & 1:
+            digit = k & ((1 << w) - 1)
+            if digit >= 1 << (w-1):
+                digit -= 1 << w
+            k -= digit
+        else:
+            digit = 0
+        naf.append(digit)
+        k >>= 1
+    return naf
 
 d = -121665 * invert(121666,q)
 I = exponent(2,(q-1)//4,q)
+d2 = (2*d) % q
+A = 486662 # Montgomery curve coefficient
+sqrt_A = sqrt_ratio(-(A+2),1) # maps Montgomery points to Edwards points
+if sqrt_A % 2 == 1:
+    sqrt_A = q - sqrt_A
+sqrt_2_root = exponent(2,(q+3)//8,q) # for Elligator2 (RFC 9380, appendix G.2)
 
 # An element of the main subgroup scalar field
+# Scalars are immutable values; their encoding is computed once and cached
 class Scalar:
+    __slots__ = ('x','encoded')
+
     def __init__(self,x):
+        self.encoded = None
         # Generated from an integer value
         if isinstance(x,int):
             self.x = x % l
         # Generated from a hex representation or 'l'
         elif isinstance(x,str):
-            try:
-                if x == 'l':
-                    self.x = l # technically not in scalar field; used for main subgroup membership
-                else:
+            if x == 'l':
+                self.x = l # technically not in scalar field; used for main subgroup membership
+            else:
+                try:
                     x = bytes.fromhex(x)
-                    self.x = sum(2**i * bit(x,i) for i in range(0,b)) % l
-            except:
-                raise TypeError
+                except:
+                    raise TypeError
+                if len(x) != b//8:
+                    raise TypeError
+                self.x = int.from_bytes(x,'little') % l
         else:
             raise TypeError
 
+    # Decode from 32 little-endian bytes (any bytes-like object)
+    @staticmethod
+    def from_bytes(data):
+        if not isinstance(data,(bytes,bytearray,memoryview)) or len(data) != b//8:
+            raise TypeError
+        return Scalar(int.from_bytes(data,'little'))
+
+    # Encode as 32 little-endian bytes
+    def to_bytes(self):
+        if self.encoded is None:
+            self.encoded = self.x.to_bytes(b//8,'little')
+        return self.encoded
+
+    def __bytes__(self):
+        return self.to_bytes()
+
     # Multiplicative inversion, with an option to let 1/0 = 0 if you're into that
     def invert(self,allow_zero=False):
         if self.x == 0:
@@ -62,26 +158,26 @@ class Scalar:
                 return Scalar(0)
             else:
                 raise ZeroDivisionError
-        return Scalar(invert(self.x,l))
+        return reduced(invert(self.x,l))
 
     # Addition
     def __add__(self,y):
         if isinstance(y,Scalar):
-            return Scalar(self.x + y.x)
+            return reduced((self.x + y.x) % l)
         return NotImplemented
 
     # Subtraction
     def __sub__(self,y):
         if isinstance(y,Scalar):
-            return Scalar(self.x - y.x)
+            return reduced((self.x - y.x) % l)
         return NotImplemented
 
     # Multiplication (possibly by an integer)
     def __mul__(self,y):
         if isinstance(y,int):
-            return Scalar(self.x * y)
+            return reduced((self.x * y) % l)
         if isinstance(y,Scalar):
-            return Scalar(self.x * y.x)
+            return reduced((self.x * y.x) % l)
         return NotImplemented
 
     def __rmul__(self,y):
@@ -92,28 +188,33 @@ class Scalar:
     # Truncated division (possibly by a positive integer)
     def __truediv__(self,y):
         if isinstance(y,int) and y >= 0:
-            return Scalar(self.x // y)
+            return reduced((self.x // y) % l)
         if isinstance(y,Scalar):
-            return Scalar(self.x // y.x)
+            return reduced((self.x // y.x) % l)
         raise NotImplemented
 
     # Integer exponentiation
     def __pow__(self,y):
         if isinstance(y,int) and y >= 0:
-            return Scalar(self.x**y)
+            return reduced(exponent(self.x,y,l))
         return NotImplemented
 
     # Equality
+    # (other types are never equal, so that Scalars can share sets and dicts with them)
     def __eq__(self,y):
         if isinstance(y,Scalar):
             return self.x == y.x
-        raise TypeError
+        return NotImplemented
 
     # Inequality
     def __ne__(self,y):
         if isinstance(y,Scalar):
             return self.x != y.x
-        raise TypeError
+        return NotImplemented
+
+    # Hash, consistent with equality
+    def __hash__(self):
+        return hash(self.x)
 
     # Less-than comparison (does not account for overflow)
     def __lt__(self,y):
@@ -141,8 +242,7 @@ class Scalar:
 
     # Hex representation
     def __repr__(self):
-        bits = [(self.x >> i) & 1 for i in range(b)]
-        return bytes.hex(bytes([sum([bits[i*8+j] << j for j in range(8)]) for i in range(b//8)]))
+        return self.to_bytes().hex()
 
     # Return underlying integer
     def __int__(self):
@@ -151,22 +251,39 @@ class Scalar:
     # Modulus (possibly by an integer)
     def __mod__(self,mod):
         if isinstance(mod,int) and mod > 0:
-            return Scalar(self.x % mod)
-        if isinstance(mod,Scalar) and mod != Scalar(0):
-            return Scalar(self.x % mod.x)
+            return reduced((self.x % mod) % l)
+        if isinstance(mod,Scalar) and mod.x != 0:
+            return reduced((self.x % mod.x) % l)
         return NotImplemented
 
     # Negation
     def __neg__(self):
-        return Scalar(-self.x)
+        return reduced(-self.x % l)
+
+# Build a Scalar directly from an integer that is already reduced modulo l; this is trusted, not checked
+def reduced(x):
+    s = Scalar.__new__(Scalar)
+    s.x = x
+    s.encoded = None
+    return s
 
 # An element of the curve group
+#
+# Points are kept internally in extended twisted Edwards coordinates (X:Y:Z:T),
+# with x = X/Z, y = Y/Z and x*y = T/Z, so that group operations need no field
+# inversions; the affine coordinates are only computed when they are needed
+# Points are immutable values; their encoding is computed once and cached
 class Point:
+    __slots__ = ('X','Y','Z','T','encoded')
+
     def __init__(self,x,y=None):
+        self.encoded = None
         # Generated from integer values
         if isinstance(x,int) and isinstance(y,int) and y is not None:
-            self.x = x
-            self.y = y
+            self.X = x % q
+            self.Y = y % q
+            self.Z = 1
+            self.T = (self.X*self.Y) % q
 
             if not self.on_curve():
                 raise ValueError
@@ -174,77 +291,146 @@ class Point:
         elif isinstance(x,str) and y is None:
             try:
                 x = bytes.fromhex(x)
-                self.y = sum(2**i * bit(x,i) for i in range(0,b-1))
-                self.x = xfromy(self.y)
-                if self.x & 1 != bit(x,b-1):
-                    self.x = q - self.x
             except:
                 raise TypeError
+            if len(x) != b//8:
+                raise TypeError
 
-            if not self.on_curve():
-                raise ValueError
+            # decompression validates the point, so there is no need to check the curve equation
+            self.X,self.Y = decompress(x)
+            self.Z = 1
+            self.T = (self.X*self.Y) % q
+            self.encoded = x
         else:
             raise TypeError
 
+    # Affine x-coordinate
+    @property
+    def x(self):
+        self.normalize()
+        return self.X
+
+    # Affine y-coordinate
+    @property
+    def y(self):
+        self.normalize()
+        return self.Y
+
+    # Scale the internal coordinates so that Z = 1 (the represented Point does not change)
+    def normalize(self):
+        if self.Z != 1:
+            z = invert(self.Z,q)
+            self.X = (self.X*z) % q
+            self.Y = (self.Y*z) % q
+            self.Z = 1
+            self.T = (self.X*self.Y) % q
+        return self
+
     # Equality
+    # (other types are never equal, so that Points can share sets and dicts with them)
     def __eq__(self,Q):
         if isinstance(Q,Point):
-            return self.x == Q.x and self.y == Q.y
-        raise TypeError
+            return (self.X*Q.Z - Q.X*self.Z) % q == 0 and (self.Y*Q.Z - Q.Y*self.Z) % q == 0
+        return NotImplemented
 
     # Inequality
     def __ne__(self,Q):
         if isinstance(Q,Point):
-            return self.x != Q.x or self.y != Q.y
-        raise TypeError
-    
-    # Addition
+            return (self.X*Q.Z - Q.X*self.Z) % q != 0 or (self.Y*Q.Z - Q.Y*self.Z) % q != 0
+        return NotImplemented
+
+    # Hash of the encoding, consistent with equality
+    def __hash__(self):
+        return hash(self.to_bytes())
+
+    # Addition (unified, so it is also valid for doubling and the neutral element)
     def __add__(self,Q):
         if isinstance(Q,Point):
-            x1 = self.x
-            y1 = self.y
-            x2 = Q.x
-            y2 = Q.y
-            x3 = (x1*y2+x2*y1) * invert(1+d*x1*x2*y1*y2,q)
-            y3 = (y1*y2+x1*x2) * invert(1-d*x1*x2*y1*y2,q)
-            return Point(x3 % q, y3 % q)
+            A = ((self.Y-self.X)*(Q.Y-Q.X)) % q
+            B = ((self.Y+self.X)*(Q.Y+Q.X)) % q
+            C = (self.T*d2*Q.T) % q
+            D = (2*self.Z*Q.Z) % q
+            E = B-A
+            F = D-C
+            G = D+C
+            H = B+A
+            return extended(E*F % q, G*H % q, F*G % q, E*H % q)
         return NotImplemented
 
     # Subtraction
     def __sub__(self,Q):
         if isinstance(Q,Point):
-            x1 = self.x
-            y1 = self.y
-            x2 = -Q.x
-            y2 = Q.y
-            x3 = (x1*y2+x2*y1) * invert(1+d*x1*x2*y1*y2,q)
-            y3 = (y1*y2+x1*x2) * invert(1-d*x1*x2*y1*y2,q)
-            return Point(x3 % q, y3 % q)
+            A = ((self.Y-self.X)*(Q.Y+Q.X)) % q
+            B = ((self.Y+self.X)*(Q.Y-Q.X)) % q
+            C = (-self.T*d2*Q.T) % q
+            D = (2*self.Z*Q.Z) % q
+            E = B-A
+            F = D-C
+            G = D+C
+            H = B+A
+            return extended(E*F % q, G*H % q, F*G % q, E*H % q)
         return NotImplemented
 
+    # Doubling
+    def double(self):
+        A = (self.X*self.X) % q
+        B = (self.Y*self.Y) % q
+        C = (2*self.Z*self.Z) % q
+        E = ((self.X+self.Y)*(self.X+self.Y) - A - B) % q
+        G = B-A
+        F = G-C
+        H = -A-B
+        return extended(E*F % q, G*H % q, F*G % q, E*H % q)
+
     # Multiplication
     def __mul__(self,y):
         # Point-Scalar: scalar multiplication
         if isinstance(y,Scalar):
-            if y == Scalar(0):
-                return Point(0,1)
-            Q = self.__mul__(y/Scalar(2))
-            Q = Q.__add__(Q)
-            if y.x & 1:
-                Q = self.__add__(Q)
-            return Q
+            if self is G:
+                return fixed_base_mul(precompute_G(),y.x)
+            return self.mul_wnaf(y)
         return NotImplemented
 
+    # Scalar multiplication using a width-w NAF and a table of odd multiples of this Point
+    def mul_wnaf(self,y,w=None):
+        if not isinstance(y,Scalar):
+            raise TypeError
+        if w is None:
+            w = wnaf_window
+        if w < 2:
+            raise ValueError
+
+        return wnaf_mul(self,y.x,w)
+
     def __rmul__(self,y):
         # Scalar-Point
         if isinstance(y,Scalar):
             return self*y
         return NotImplemented
 
+    # Decode from the 32-byte encoding (any bytes-like object): the y-coordinate with the parity of x in the top bit
+    @staticmethod
+    def from_bytes(data):
+        if not isinstance(data,(bytes,bytearray,memoryview)) or len(data) != b//8:
+            raise TypeError
+        x,y = decompress(data)
+        P = extended(x,y,1,(x*y) % q)
+        P.encoded = bytes(data)
+        return P
+
+    # Encode as 32 bytes
+    def to_bytes(self):
+        if self.encoded is None:
+            self.normalize()
+            self.encoded = (self.Y | (self.X & 1) << (b-1)).to_bytes(b//8,'little')
+        return self.encoded
+
+    def __bytes__(self):
+        return self.to_bytes()
+
     # Hex representation
     def __repr__(self):
-        bits = [(self.y >> i) & 1 for i in range(b-1)] + [self.x & 1]
-        return bytes.hex(bytes([sum([bits[i*8+j] << j for j in range(8)]) for i in range(b//8)]))
+        return self.to_bytes().hex()
 
     # Curve membership (not main subgroup!)
     def on_curve(self):
@@ -252,12 +438,87 @@ class Point:
         y = self.y
         return (-x*x + y*y - 1 - d*x*x*y*y) % q == 0
 
+    # Main subgroup membership: l times the Point is the neutral element (using the wNAF addition chain for l)
+    def is_torsion_free(self):
+        return wnaf_mul(self,l,wnaf_window) == Z
+
+    # The torsion component of the Point, from small_order_points (see torsion_index)
+    def torsion_component(self):
+        return small_order_points[torsion_index(self)]
+
     # Negation
     def __neg__(self):
-        return Z - self
+        return extended(-self.X % q, self.Y, self.Z, -self.T % q)
+
+# Build a Point directly from extended coordinates; these are trusted to be on the curve, not checked
+def extended(X,Y,Z,T):
+    P = Point.__new__(Point)
+    P.X = X
+    P.Y = Y
+    P.Z = Z
+    P.T = T
+    P.encoded = None
+    return P
+
+# Odd multiples of a Point: table[i] = (2i+1)*P for i = 0..top
+def odd_multiples(P,top):
+    table = [P]
+    if top > 0:
+        double = P.double()
+        for i in range(top):
+            table.append(table[-1] + double)
+    return table
+
+# Normalize a list of Points in place (see Point.normalize), sharing a single field inversion
+def batch_normalize(points):
+    pending = list({id(P): P for P in points if P.Z != 1}.values()) # the same Point may appear more than once
+    if len(pending) > 0:
+        for P,z in zip(pending,batch_invert([P.Z for P in pending],q)):
+            P.X = (P.X*z) % q
+            P.Y = (P.Y*z) % q
+            P.Z = 1
+            P.T = (P.X*P.Y) % q
+    return points
+
+# Affine (y+x,y-x,2*d*x*y) triples of a list of Points, for mixed additions
+def niels(points):
+    return [((P.Y+P.X) % q,(P.Y-P.X) % q,(d2*P.T) % q) for P in batch_normalize(points)]
+
+# Mixed addition of extended coordinates (X,Y,Z,T) and an affine (y+x,y-x,2*d*x*y) triple
+def madd(P,N):
+    X,Y,Z,T = P
+    ypx,ymx,t2d = N
+    A = ((Y-X)*ymx) % q
+    B = ((Y+X)*ypx) % q
+    C = (T*t2d) % q
+    D = 2*Z
+    E = B-A
+    F = D-C
+    G = D+C
+    H = B+A
+    return (E*F % q,G*H % q,F*G % q,E*H % q)
+
+# Multiply a Point by a nonnegative integer using its width-w NAF
+def wnaf_mul(P,k,w):
+    naf = wnaf(k,w)
+    if len(naf) == 0:
+        return extended(0,1,1,0)
+    table = odd_multiples(P,max(abs(digit) for digit in naf) >> 1)
+
+    # the leading digit is always positive
+    Q = table[naf[-1] >> 1]
+    for i in range(len(naf)-2,-1,-1):
+        Q = Q.double()
+        if naf[i] > 0:
+            Q = Q + table[naf[i] >> 1]
+        elif naf[i] < 0:
+            Q = Q - table[-naf[i] >> 1]
+    return Q
 
 # A vector of Points with superpowers
 class PointVector:
+    __slots__ = ('items','buffer')
+
     def __init__(self,points=None):
         if points is None:
             points = []
@@ -266,6 +527,38 @@ class PointVector:
                 raise TypeError
         self.points = points
 
+    # Underlying Points; a vector loaded with from_buffer decodes all of them on first use
+    @property
+    def points(self):
+        if self.buffer is not None:
+            self.items = PointVector.from_encodings([self.buffer[i:i+b//8] for i in range(0,len(self.buffer),b//8)]).items
+            self.buffer = None
+        return self.items
+
+    @points.setter
+    def points(self,points):
+        self.items = points
+        self.buffer = None
+
+    # Load packed 32-byte Point encodings from any bytes-like object (or mmap), without copying it
+    # Nothing is decoded until the Points are used, and single Points or slices are decoded on their own;
+    # an invalid encoding raises ValueError when it is decoded
+    @staticmethod
+    def from_buffer(buffer):
+        buffer = memoryview(buffer).cast('B')
+        if len(buffer) % (b//8) != 0:
+            raise TypeError
+        W = PointVector.__new__(PointVector)
+        W.items = None
+        W.buffer = buffer
+        return W
+
+    # Packed 32-byte encodings of the Points, normalized with a single shared inversion
+    def to_buffer(self):
+        if self.buffer is not None:
+            return bytes(self.buffer)
+        return b''.join(P.to_bytes() for P in batch_normalize(self.items))
+
     # Equality
     def __eq__(self,W):
         if isinstance(W,PointVector):
@@ -278,26 +571,52 @@ class PointVector:
             return self.points != W.points
         raise TypeError
 
-    # Addition
+    # Addition (the results are normalized with a single shared inversion)
     def __add__(self,W):
         if isinstance(W,PointVector) and len(self.points) == len(W.points):
-            return PointVector([self.points[i] + W.points[i] for i in range(len(self.points))])
+            if use_numpy(len(self.points)):
+                return PointVector(fe_to_points(fe_point_add(fe_points(self.points),fe_points(W.points))))
+            return PointVector(batch_normalize([self.points[i] + W.points[i] for i in range(len(self.points))]))
         return NotImplemented
 
-    # Subtraction
+    # Subtraction (the results are normalized with a single shared inversion)
     def __sub__(self,W):
         if isinstance(W,PointVector) and len(self.points) == len(W.points):
-            return PointVector([self.points[i] - W.points[i] for i in range(len(self.points))])
+            if use_numpy(len(self.points)):
+                return PointVector(fe_to_points(fe_point_add(fe_points(self.points),fe_points([-P for P in W.points]))))
+            return PointVector(batch_normalize([self.points[i] - W.points[i] for i in range(len(self.points))]))
         return NotImplemented
 
+    # Componentwise doubling (the results are normalized with a single shared inversion)
+    def double(self):
+        if use_numpy(len(self.points)):
+            return PointVector(fe_to_points(fe_point_double(fe_points(self.points))))
+        return PointVector(batch_normalize([P.double() for P in self.points]))
+
+    # Decode a list of 32-byte Point encodings, each with a single exponentiation (or batched, with NumPy)
+    @staticmethod
+    def from_encodings(encodings):
+        if use_numpy(len(encodings)):
+            for data in encodings:
+                if not isinstance(data,(bytes,bytearray,memoryview)) or len(data) != b//8:
+                    raise TypeError
+            return PointVector(fe_decompress([bytes(data) for data in encodings]))
+        return PointVector([Point.from_bytes(data) for data in encodings])
+
+    # Normalize all Points in place with a single shared inversion (see Point.normalize)
+    def normalize(self):
+        batch_normalize(self.points)
+        return self
+
     # Multiplication
     def __mul__(self,s):
         # PointVector-Scalar: componentwise Point-Scalar multiplication
+        # (see batch_mul for splitting the work across processes)
         if isinstance(s,Scalar):
-            return PointVector([self.points[i]*s for i in range(len(self.points))])
+            return batch_mul(self,s)
         # PointVector-ScalarVector: Hadamard product
-        if isinstance(s,ScalarVector) and len(self.points) == len(s.scalars):
-            return PointVector([s[i]*self[i] for i in range(len(self))])
+        if isinstance(s,ScalarVector) and len(self.points) == len(s.values):
+            return batch_mul(self,s)
         return NotImplemented
 
     def __rmul__(self,s):
@@ -309,18 +628,50 @@ class PointVector:
             return self*s
         return NotImplemented
 
+    # Main subgroup membership of each Point, as a list of booleans
+    # Since l times any Point has order dividing 8, a random combination of the Points with 3-bit weights
+    # is tested with one multiexp and one multiplication by l; a group with any torsion passes a round
+    # with probability at most 1/2, so `rounds` rounds bound it by 2**-rounds
+    # Failing groups are bisected, and groups of at most `rounds` Points are checked one by one
+    def torsion_free_mask(self,rounds=64):
+        mask = [True]*len(self.points)
+        pending = [(0,len(self.points))]
+        while len(pending) > 0:
+            start,end = pending.pop()
+            if end - start <= rounds:
+                for i in range(start,end):
+                    mask[i] = self.points[i].is_torsion_free()
+                continue
+            points = PointVector(self.points[start:end])
+            for i in range(rounds):
+                weights = scalar_vector([secrets.randbelow(cofactor) for j in range(start,end)])
+                if not multiexp(weights,points).is_torsion_free():
+                    pending.append((start,(start+end)//2))
+                    pending.append(((start+end)//2,end))
+                    break
+        return mask
+
     # Multiscalar multiplication
     def __pow__(self,s):
-        if isinstance(s,ScalarVector) and len(self.points) == len(s.scalars):
+        if isinstance(s,ScalarVector) and len(self.points) == len(s.values):
             return multiexp(s,self)
         return NotImplemented
 
     # Length
     def __len__(self):
+        if self.buffer is not None:
+            return len(self.buffer) // (b//8)
         return len(self.points)
 
     # Get slice
     def __getitem__(self,i):
+        if self.buffer is not None:
+            indices = range(len(self))[i]
+            if not isinstance(i,slice):
+                return Point.from_bytes(self.buffer[indices*(b//8):(indices+1)*(b//8)])
+            if indices.step == 1:
+                return PointVector.from_buffer(self.buffer[indices.start*(b//8):indices.stop*(b//8)])
+            return PointVector.from_buffer(b''.join(self.buffer[j*(b//8):(j+1)*(b//8)] for j in indices))
         if not isinstance(i,slice):
             return self.points[i]
         return PointVector(self.points[i])
@@ -351,52 +702,94 @@ class PointVector:
     def __repr__(self):
         return repr(self.points)
 
-    # Negation
+    # Negation (normalized Points stay normalized)
     def __neg__(self):
         return PointVector([-P for P in self.points])
 
 # A vector of Scalars with superpowers
+#
+# The Scalars are stored as a plain list of reduced integers, and Scalar objects are only
+# built when elements are read; sums and inner products are reduced once at the end
 class ScalarVector:
+    __slots__ = ('items','buffer')
+
     def __init__(self,scalars=None):
         if scalars is None:
             scalars = []
         for scalar in scalars:
             if not isinstance(scalar,Scalar):
                 raise TypeError
-        self.scalars = scalars
+        self.values = [scalar.x for scalar in scalars]
+
+    # Underlying integer values; a vector loaded with from_buffer parses all of them on first use
+    @property
+    def values(self):
+        if self.buffer is not None:
+            self.items = [int.from_bytes(self.buffer[i:i+b//8],'little') % l for i in range(0,len(self.buffer),b//8)]
+            self.buffer = None
+        return self.items
+
+    @values.setter
+    def values(self,values):
+        self.items = values
+        self.buffer = None
+
+    # Load packed 32-byte little-endian Scalars from any bytes-like object (or mmap), without copying it
+    # Nothing is parsed until the Scalars are used, and single Scalars or slices are parsed on their own
+    @staticmethod
+    def from_buffer(buffer):
+        buffer = memoryview(buffer).cast('B')
+        if len(buffer) % (b//8) != 0:
+            raise TypeError
+        s = ScalarVector.__new__(ScalarVector)
+        s.items = None
+        s.buffer = buffer
+        return s
+
+    # Packed 32-byte little-endian encodings of the Scalars
+    def to_buffer(self):
+        if self.buffer is not None:
+            return bytes(self.buffer)
+        return b''.join(x.to_bytes(b//8,'little') for x in self.items)
+
+    # Underlying Scalars, as a tuple: the vector stores integers, so change it through its own methods (v[i] = s)
+    @property
+    def scalars(self):
+        return tuple(reduced(x) for x in self.values)
 
     # Equality
     def __eq__(self,s):
         if isinstance(s,ScalarVector):
-            return self.scalars == s.scalars
+            return self.values == s.values
         raise TypeError
 
     # Inequality
     def __ne__(self,s):
         if isinstance(s,ScalarVector):
-            return self.scalars != s.scalars
+            return self.values != s.values
         raise TypeError
 
     # Addition
     def __add__(self,s):
-        if isinstance(s,ScalarVector) and len(self.scalars) == len(s.scalars):
-            return ScalarVector([self.scalars[i] + s.scalars[i] for i in range(len(self.scalars))])
+        if isinstance(s,ScalarVector) and len(self.values) == len(s.values):
+            return scalar_vector([(x + y) % l for x,y in zip(self.values,s.values)])
         return NotImplemented
 
     # Subtraction
     def __sub__(self,s):
-        if isinstance(s,ScalarVector) and len(self.scalars) == len(s.scalars):
-            return ScalarVector([self.scalars[i] - s.scalars[i] for i in range(len(self.scalars))])
+        if isinstance(s,ScalarVector) and len(self.values) == len(s.values):
+            return scalar_vector([(x - y) % l for x,y in zip(self.values,s.values)])
         return NotImplemented
 
     # Multiplication
     def __mul__(self,s):
         # ScalarVector-Scalar: componentwise Scalar-Scalar multiplication 
         if isinstance(s,Scalar):
-            return ScalarVector([self.scalars[i]*s for i in range(len(self.scalars))])
+            y = s.x
+            return scalar_vector([(x * y) % l for x in self.values])
         # ScalarVector-ScalarVector: Hadamard product
-        if isinstance(s,ScalarVector) and len(self.scalars) == len(s.scalars):
-            return ScalarVector([self.scalars[i]*s.scalars[i] for i in range(len(self.scalars))])
+        if isinstance(s,ScalarVector) and len(self.values) == len(s.values):
+            return scalar_vector([(x * y) % l for x,y in zip(self.values,s.values)])
         return NotImplemented
 
     def __rmul__(self,s):
@@ -407,19 +800,13 @@ class ScalarVector:
 
     # Sum of all Scalars
     def sum(self):
-        r = Scalar(0)
-        for i in range(len(self.scalars)):
-            r += self.scalars[i]
-        return r
+        return reduced(sum(self.values) % l)
 
     # Inner product and multiscalar multiplication
     def __pow__(self,s):
         # ScalarVector**ScalarVector: inner product
-        if isinstance(s,ScalarVector) and len(self.scalars) == len(s.scalars):
-            r = Scalar(0)
-            for i in range(len(self.scalars)):
-                r += self.scalars[i]*s.scalars[i]
-            return r
+        if isinstance(s,ScalarVector) and len(self.values) == len(s.values):
+            return reduced(sum(x * y for x,y in zip(self.values,s.values)) % l)
         # ScalarVector**PointVector: multiscalar multiplication
         if isinstance(s,PointVector):
             return s**self
@@ -427,112 +814,295 @@ class ScalarVector:
 
     # Length
     def __len__(self):
-        return len(self.scalars)
+        if self.buffer is not None:
+            return len(self.buffer) // (b//8)
+        return len(self.values)
 
     # Get slice
     def __getitem__(self,i):
+        if self.buffer is not None:
+            indices = range(len(self))[i]
+            if not isinstance(i,slice):
+                return Scalar.from_bytes(self.buffer[indices*(b//8):(indices+1)*(b//8)])
+            if indices.step == 1:
+                return ScalarVector.from_buffer(self.buffer[indices.start*(b//8):indices.stop*(b//8)])
+            return ScalarVector.from_buffer(b''.join(self.buffer[j*(b//8):(j+1)*(b//8)] for j in indices))
         if not isinstance(i,slice):
-            return self.scalars[i]
-        return ScalarVector(self.scalars[i])
+            return reduced(self.values[i])
+        return scalar_vector(self.values[i])
 
     # Set at index
     def __setitem__(self,i,s):
         if isinstance(s,Scalar):
-            self.scalars[i] = s
+            self.values[i] = s.x
         else:
             raise TypeError
 
     # Append
     def append(self,item):
         if isinstance(item,Scalar):
-            self.scalars.append(item)
+            self.values.append(item.x)
         else:
             raise TypeError
 
     # Extend
     def extend(self,items):
         if isinstance(items,ScalarVector):
-            for item in items.scalars:
-                self.scalars.append(item)
+            self.values.extend(items.values)
         else:
             raise TypeError
 
     # Hex representation of underlying Scalars
     def __repr__(self):
-        return repr(self.scalars)
+        return repr([reduced(x) for x in self.values])
 
     # Componentwise inversion (possibly with zero)
     def invert(self,allow_zero=False):
-        # If we allow zero, the efficient method doesn't work
+        # If we allow zero, skip zeros in the batch inversion and leave them as zero
         if allow_zero:
-            return ScalarVector([s.invert(allow_zero=True) for s in self.scalars])
+            indexes = [i for i in range(len(self.values)) if self.values[i] % l != 0]
+            inverses = [0]*len(self.values)
+            for i,inverse in zip(indexes,batch_invert([self.values[i] for i in indexes],l)):
+                inverses[i] = inverse
+            return scalar_vector(inverses)
 
         # Don't allow zero
-        inputs = self.scalars[:]
-        n = len(inputs)
-        scratch = [Scalar(1)]*n
-        acc = Scalar(1)
-
-        for i in range(n):
-            if inputs[i] == Scalar(0):
-                raise ZeroDivisionError
-            scratch[i] = acc
-            acc *= inputs[i]
-        acc = Scalar(invert(acc.x,l))
-        for i in range(n-1,-1,-1):
-            temp = acc*inputs[i]
-            inputs[i] = acc*scratch[i]
-            acc = temp
-
-        return ScalarVector(inputs)
+        return scalar_vector(batch_invert(self.values,l))
 
     # Negation
     def __neg__(self):
-        return ScalarVector([-s for s in self.scalars])
+        return scalar_vector([-x % l for x in self.values])
+
+# Build a ScalarVector directly from a list of integers that are already reduced modulo l; this is trusted, not checked
+def scalar_vector(values):
+    s = ScalarVector.__new__(ScalarVector)
+    s.values = values
+    return s
 
 # Try to make a point from a given y-coordinate
 def make_point(y):
     if not y < q: # stay in the field
         return None
     x = xfromy(y)
-    try:
-        P = Point(x,y)
-    except ValueError:
+    if x is None:
         return None
-    return P
+    return extended(x,y,1,(x*y) % q)
 
-# Hash data to get a Point in the main subgroup
-def hash_to_point(*data):
-    result = ''
+# Hex digests of the string representations of some data, concatenated
+def hash_data(data):
     for datum in data:
         if datum is None:
             raise TypeError
-        result += blake2s(str(datum).encode('utf-8')).hexdigest()
+    return ''.join(blake2s(str(datum).encode('utf-8')).hexdigest() for datum in data)
+
+# Elligator2 map of a field element to a curve point (RFC 9380, section 6.7.1)
+# The point is found on the birationally equivalent Montgomery curve v^2 = u^3 + A*u^2 + u and then mapped to Edwards form
+# This is the straight-line version of RFC 9380, appendix G.2: the square root for the second candidate is
+# derived from the first, so one exponentiation covers both, and the result is left in extended coordinates,
+# so the Edwards map needs no inversion either
+def elligator2(r):
+    # Montgomery candidates u1 = xn/xd and u2 = 2*r^2*u1, with g(u1) = gx1/gxd
+    tv1 = (2*r*r) % q
+    xd = (tv1 + 1) % q # never zero, since -1/2 is not a square
+    x1n = -A % q
+    tv2 = (xd*xd) % q
+    gxd = (tv2*xd) % q
+    gx1 = (((A*tv1 % q)*x1n + tv2)*x1n) % q
+    tv3 = (gxd*gxd) % q
+    tv2 = (tv3*tv3) % q
+    tv3 = (tv3*gxd*gx1) % q
+    y11 = (tv3*exponent(tv2*tv3,(q-5)//8,q)) % q
+    y12 = (y11*I) % q
+    y1 = y11 if (y11*y11*gxd - gx1) % q == 0 else y12 # a square root of g(u1), if there is one
+
+    # a square root of g(u2) = 2*r^2*g(u1) follows from the same exponentiation
+    x2n = (x1n*tv1) % q
+    y21 = (y11*r*sqrt_2_root) % q
+    y22 = (y21*I) % q
+    gx2 = (gx1*tv1) % q
+    y2 = y21 if (y21*y21*gxd - gx2) % q == 0 else y22
+
+    # take u1 if g(u1) is a square (with v odd), and u2 otherwise (with v even)
+    square = (y1*y1*gxd - gx1) % q == 0
+    xn = x1n if square else x2n
+    y = y1 if square else y2
+    if square != (y % 2 == 1):
+        y = q-y
+
+    # map (u,v) = (xn/xd,y) to Edwards form (sqrt_A*u/v,(u-1)/(u+1)); exceptional points go to the neutral element
+    ex = (sqrt_A*xn) % q
+    ed = (xd*y) % q
+    yn = (xn - xd) % q
+    yd = (xn + xd) % q
+    if ed*yd % q == 0:
+        return extended(0,1,1,0)
+    return extended((ex*yd) % q,(yn*ed) % q,(ed*yd) % q,(ex*yn) % q)
+
+# Montgomery-ladder scalar multiplication of the u-coordinate of a point on the Montgomery curve (RFC 7748, section 5)
+# Only u-coordinates are used, so the result is the same for a point and its negation
+def montgomery_ladder(k,u):
+    x2,z2,x3,z3 = 1,0,u,1
+    swap = 0
+    for t in range(k.bit_length()-1,-1,-1):
+        bit = (k >> t) & 1
+        if swap ^ bit:
+            x2,x3 = x3,x2
+            z2,z3 = z3,z2
+        swap = bit
+        a = x2+z2
+        aa = a*a % q
+        c = x2-z2
+        cc = c*c % q
+        e = aa-cc
+        da = (x3-z3)*a % q
+        cb = (x3+z3)*c % q
+        x3 = (da+cb)**2 % q
+        z3 = u*(da-cb)**2 % q
+        x2 = aa*cc % q
+        z2 = e*(aa + 121665*e) % q # (A-2)/4 = 121665
+    if swap:
+        x2,z2 = x3,z3
+    return (x2*invert(z2,q)) % q
+
+# The Montgomery u-coordinate (1+y)/(1-y) of a Point, as 32 little-endian bytes
+# The neutral element maps to zero
+def montgomery_u(P):
+    if not isinstance(P,Point):
+        raise TypeError
+    return (((P.Z+P.Y)*invert(P.Z-P.Y,q)) % q).to_bytes(b//8,'little')
 
-    # Continue hashing until we get a valid Point
-    while True:
-        result = blake2s(result.encode('utf-8')).hexdigest()
-        if make_point(int(result,16)) is not None:
-            return make_point(int(result,16))*Scalar(cofactor)
+# Diffie-Hellman on u-coordinates (X25519 style, but with a Scalar rather than a clamped integer)
+# Returns the u-coordinate of s times the point with u-coordinate `u`, both as 32 little-endian bytes
+# As in RFC 7748, the top bit of `u` is ignored and non-canonical values are reduced
+def x25519(s,u):
+    if not isinstance(s,Scalar) or not isinstance(u,(bytes,bytearray,memoryview)) or len(u) != b//8:
+        raise TypeError
+    u = (int.from_bytes(u,'little') & ((1 << (b-1)) - 1)) % q
+    return montgomery_ladder(s.x,u).to_bytes(b//8,'little')
+
+# Diffie-Hellman public key for a Scalar: the u-coordinate of s*G, as 32 little-endian bytes
+def x25519_public(s):
+    if not isinstance(s,Scalar):
+        raise TypeError
+    return montgomery_u(G*s)
+
+# Hash data to get a Point in the main subgroup
+# The 'legacy' mode retries until the hash is a valid y-coordinate; the 'elligator2' mode needs no retries
+# Both are deterministic but give different Points; `mode` defaults to hash_mode
+# Results are memoized in hash_cache, if it is enabled
+def hash_to_point(*data,mode=None):
+    if mode is None:
+        mode = hash_mode
+    if mode not in ('legacy','elligator2'):
+        raise ValueError
+    result = hash_data(data)
+    if hash_cache is not None:
+        key = 'point:' + mode + ':' + result
+        P = hash_cache.get(key)
+        if P is not None:
+            return P
+
+    if mode == 'legacy':
+        # Continue hashing until we get a valid Point
+        while True:
+            result = blake2s(result.encode('utf-8')).hexdigest()
+            P = make_point(int(result,16))
+            if P is not None:
+                break
+    else:
+        r = int.from_bytes(blake2b(('elligator2' + result).encode('utf-8')).digest(),'little') % q
+        P = elligator2(r)
+    P = P.double().double().double() # clear the cofactor
+
+    if hash_cache is not None:
+        hash_cache.put(key,P,sys.getsizeof(key) + sys.getsizeof(P) + sum(sys.getsizeof(i) for i in (P.X,P.Y,P.Z,P.T)))
+    return P
 
 # Hash data to get a Scalar
+# Results are memoized in hash_cache, if it is enabled
 def hash_to_scalar(*data):
-    result = ''
-    for datum in data:
-        if datum is None:
-            raise TypeError
-        result += blake2s(str(datum).encode('utf-8')).hexdigest()
+    result = hash_data(data)
+    if hash_cache is not None:
+        key = 'scalar:' + result
+        s = hash_cache.get(key)
+        if s is not None:
+            return s
 
     # Continue hashing until we get a valid Scalar
     while True:
         result = blake2s(result.encode('utf-8')).hexdigest()
         if int(result,16) < l:
-            return Scalar(int(result,16))
+            s = reduced(int(result,16))
+            break
+
+    if hash_cache is not None:
+        hash_cache.put(key,s,sys.getsizeof(key) + sys.getsizeof(s) + sys.getsizeof(s.x))
+    return s
+
+# An incremental Fiat-Shamir transcript
+# Messages are fed as canonical bytes, each with a type tag and length, into one streaming blake2b state, so
+# deriving a challenge never re-serializes earlier messages; every challenge is also absorbed into the state
+class Transcript:
+    def __init__(self,label=None):
+        self.state = blake2b()
+        if label is not None:
+            self.append(label)
+
+    # Absorb messages: Scalars, Points, ScalarVectors, PointVectors, bytes-like objects, strings or nonnegative integers
+    def append(self,*data):
+        for datum in data:
+            if isinstance(datum,Scalar):
+                self.state.update(b'S' + datum.to_bytes())
+            elif isinstance(datum,Point):
+                self.state.update(b'P' + datum.to_bytes())
+            elif isinstance(datum,ScalarVector):
+                self.state.update(b'V' + len(datum).to_bytes(8,'little'))
+                for x in datum.values:
+                    self.state.update(x.to_bytes(b//8,'little'))
+            elif isinstance(datum,PointVector):
+                self.state.update(b'W' + len(datum).to_bytes(8,'little'))
+                for P in datum.points:
+                    self.state.update(P.to_bytes())
+            elif isinstance(datum,(bytes,bytearray,memoryview)):
+                self.state.update(b'B' + len(datum).to_bytes(8,'little'))
+                self.state.update(datum)
+            elif isinstance(datum,str):
+                datum = datum.encode('utf-8')
+                self.state.update(b'T' + len(datum).to_bytes(8,'little') + datum)
+            elif isinstance(datum,int) and datum >= 0:
+                datum = datum.to_bytes((datum.bit_length() + 7) // 8,'little')
+                self.state.update(b'I' + len(datum).to_bytes(8,'little') + datum)
+            else:
+                raise TypeError
+        return self
+
+    # Copy of this transcript that can be extended independently
+    def fork(self,label=None):
+        transcript = Transcript.__new__(Transcript)
+        transcript.state = self.state.copy()
+        if label is not None:
+            transcript.append(label)
+        return transcript
+
+    # Derive 64 challenge bytes and absorb them
+    def challenge(self):
+        self.state.update(b'C')
+        digest = self.state.copy().digest()
+        self.state.update(digest)
+        return digest
+
+    # Derive a challenge Scalar (reduced from 512 bits, so no retries are needed)
+    def challenge_scalar(self):
+        return Scalar(int.from_bytes(self.challenge(),'little'))
+
+    # Derive a challenge Point in the main subgroup
+    def challenge_point(self):
+        return elligator2(int.from_bytes(self.challenge(),'little') % q).double().double().double()
 
 # Generate a random Scalar
 def random_scalar(zero=True):
-    value = Scalar(secrets.randbelow(l))
-    if not zero and value == Scalar(0):
+    value = reduced(secrets.randbelow(l))
+    if not zero and value.x == 0:
         raise ValueError('Random scalar unexpectedly returned zero!')
     return value
 
@@ -548,8 +1118,718 @@ G = Point(Gx % q, Gy % q)
 # Neutral group element
 Z = Point(0,1)
 
-# Perform a multiscalar multiplication using a simplified Pippenger algorithm
-def multiexp(scalars,points):
+# A generator of the small subgroup of size cofactor = 8, and its multiples k*G_small for k = 0,...,7
+G_small = Point('c7176a703d4dd84fba3c0b760d10670f2a2053fa2c39ccc64ec7fd7792ac03fa')
+small_order_points = batch_normalize([wnaf_mul(G_small,k,wnaf_window) for k in range(cofactor)])
+small_order_encodings = [P.to_bytes() for P in small_order_points]
+
+# The index k such that P = P' + k*G_small with P' in the main subgroup
+# The torsion component is (1/l mod 8)*l*P = 5*l*P; its encoding is compared with every entry of the
+# table, with no early exit
+def torsion_index(P):
+    encoding = wnaf_mul(P,5*l,wnaf_window).to_bytes()
+    index = 0
+    for k in range(cofactor):
+        index |= k & -(encoding == small_order_encodings[k])
+    return index
+
+# Build a fixed-base table for a Point P
+# Row i holds j*16**i*P for j = 1..8 as affine (y+x,y-x,2*d*x*y) triples, so that a
+# multiplication is just one mixed addition per radix-16 digit and no doublings
+def fixed_base_table(P):
+    points = []
+    base = P
+    for i in range(b//4):
+        row = [base]
+        for j in range(7):
+            row.append(row[-1] + base)
+        base = row[-1].double()
+        points.extend(row)
+
+    triples = niels(points)
+    return [triples[8*i:8*i+8] for i in range(b//4)]
+
+# Signed radix-16 digits of a nonnegative integer below 2**255, each in [-8,8]
+def radix16(k):
+    digits = [(k >> (4*i)) & 15 for i in range(b//4)]
+    carry = 0
+    for i in range(b//4-1):
+        digits[i] += carry
+        carry = (digits[i] + 8) >> 4
+        digits[i] -= carry << 4
+    digits[-1] += carry
+    return digits
+
+# Multiply the Point that built a fixed-base table by a nonnegative integer
+def fixed_base_mul(table,k):
+    R = (0,1,1,0)
+    for i,digit in enumerate(radix16(k)):
+        if digit > 0:
+            R = madd(R,table[i][digit-1])
+        elif digit < 0:
+            ypx,ymx,t2d = table[i][-digit-1]
+            R = madd(R,(ymx,ypx,-t2d))
+    return extended(*R)
+
+# Approximate memory footprint of a fixed-base table, in bytes
+def table_size(table):
+    size = sys.getsizeof(table)
+    for row in table:
+        size += sys.getsizeof(row)
+        for entry in row:
+            size += sys.getsizeof(entry) + sum(sys.getsizeof(i) for i in entry)
+    return size
+
+# A least-recently-used cache bounded by the total size of its entries
+class LRUCache:
+    def __init__(self,capacity):
+        if not isinstance(capacity,int) or capacity < 0:
+            raise ValueError
+        self.capacity = capacity # maximum total size, in bytes
+        self.entries = OrderedDict() # key -> (value,size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Look up a value, or return None on a miss
+    def get(self,key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    # Insert a value, evicting the least recently used entries to make room
+    # Values larger than the whole cache are not stored; returns whether the value was stored
+    def put(self,key,value,size):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if size > self.capacity:
+            return False
+        self.entries[key] = (value,size)
+        self.size += size
+        self.evict()
+        return True
+
+    # Change the capacity, evicting entries if needed
+    def resize(self,capacity):
+        if not isinstance(capacity,int) or capacity < 0:
+            raise ValueError
+        self.capacity = capacity
+        self.evict()
+
+    # Evict least recently used entries until the cache fits
+    def evict(self):
+        while self.size > self.capacity:
+            self.size -= self.entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    # Drop all entries and reset the statistics
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Usage statistics
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'size': self.size,
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups > 0 else 0.0
+        }
+
+    # Length
+    def __len__(self):
+        return len(self.entries)
+
+# Fixed-base tables of user-registered Points, keyed by their hex representation
+# Each table takes roughly 130 KB, so the default capacity holds about a hundred of them
+precompute_cache = LRUCache(16*2**20)
+
+# Memoized results of hash_to_point and hash_to_scalar, keyed by the hash of their input data (and the hash mode)
+# This is off (None) by default; enable_hash_cache() turns it on
+hash_cache = None
+
+# Start memoizing hashes in an LRU cache of the given capacity in bytes (about 500 bytes per Point), and return it
+# Its stats() give the hit rate, and clear() empties it
+def enable_hash_cache(capacity=2**20):
+    global hash_cache
+    hash_cache = LRUCache(capacity)
+    return hash_cache
+
+# Stop memoizing hashes, dropping the cache
+def disable_hash_cache():
+    global hash_cache
+    hash_cache = None
+
+# A Point whose multiplications use a cached fixed-base table
+# It is otherwise an ordinary Point; the table is rebuilt if it was evicted from the cache
+class FixedBasePoint(Point):
+    __slots__ = ('key',)
+
+    def __init__(self,P):
+        if not isinstance(P,Point):
+            raise TypeError
+        self.X = P.X
+        self.Y = P.Y
+        self.Z = P.Z
+        self.T = P.T
+        self.encoded = P.to_bytes()
+        self.key = repr(P)
+
+    # Fixed-base table, from the cache if possible
+    def table(self):
+        table = precompute_cache.get(self.key)
+        if table is None:
+            table = fixed_base_table(self)
+            precompute_cache.put(self.key,table,table_size(table))
+        return table
+
+    # Multiplication
+    def __mul__(self,y):
+        # Point-Scalar: fixed-base scalar multiplication
+        if isinstance(y,Scalar):
+            return fixed_base_mul(self.table(),y.x)
+        return NotImplemented
+
+# Register a Point for fixed-base multiplication, building its table ahead of time
+def precompute(P):
+    P = FixedBasePoint(P)
+    P.table()
+    return P
+
+# Fixed-base table for G; built on the first multiplication of G, or ahead of time by calling this
+# It is kept outside the cache so that it is never evicted
+G_table = None
+
+def precompute_G():
+    global G_table
+    if G_table is None:
+        G_table = fixed_base_table(G)
+    return G_table
+
+# Batched field arithmetic with NumPy (optional)
+#
+# A batch of field elements is an array of shape (10,n): each column holds one element as signed 64-bit
+# limbs in radix 2**25.5 (alternating 26 and 25 bits, as in ref10), so every field operation runs across
+# the whole batch at once. Limbs are kept small enough (carried) that products of sums of two carried
+# elements cannot overflow. Large PointVector operations use this when NumPy is installed.
+fe_widths = [26,25]*5
+fe_offsets = [sum(fe_widths[:i]) for i in range(10)]
+fe_chunk = 4096 # columns per multiplication step, to keep the working set in cache
+fe_mul_block = 1024 # lanes per block of fe_point_mul, each of which needs a table of 16 Points
+numpy_threshold = 1024 # PointVector operations on at least this many Points use NumPy, if it is available
+
+if numpy is not None:
+    fe_shift = numpy.array(fe_widths,dtype=numpy.int64)[:,None]
+    fe_mask = (numpy.int64(1) << fe_shift) - 1
+
+    # Limb products a[i]*b[j] land in limb (i+j) % 10, times 2 if i and j are both odd (radix 2**25.5)
+    # and times 19 if they wrap around (2**255 = 19 mod q); row r of the table for a[i] uses b[fe_index[i,r]]
+    # scaled by the fe_kind[i,r]-th entry of (1,2,19,38)
+    fe_kind = numpy.zeros((10,10),dtype=numpy.int64)
+    fe_index = numpy.zeros((10,10),dtype=numpy.int64)
+    for i in range(10):
+        for r in range(10):
+            j = (r-i) % 10
+            fe_index[i,r] = j
+            fe_kind[i,r] = (1 if i % 2 == 1 and j % 2 == 1 else 0) + (2 if i+j >= 10 else 0)
+
+# Whether NumPy should be used for a batch of n elements
+def use_numpy(n):
+    return numpy is not None and n >= numpy_threshold
+
+# Carry the limbs of a batch in place (two parallel passes)
+def fe_carry(h):
+    for i in range(2):
+        c = h >> fe_shift
+        h &= fe_mask
+        h[1:] += c[:-1]
+        h[0] += 19*c[9]
+    return h
+
+# Batch multiplication
+def fe_mul(a,b):
+    h = numpy.empty_like(a)
+    for i in range(0,a.shape[1],fe_chunk):
+        x = a[:,i:i+fe_chunk]
+        y = b[:,i:i+fe_chunk]
+        table = numpy.stack([y,2*y,19*y,38*y])[fe_kind,fe_index]
+        h[:,i:i+fe_chunk] = numpy.einsum('in,irn->rn',x,table)
+    return fe_carry(h)
+
+# Batch exponentiation by a common nonnegative exponent, with a fixed 4-bit window
+def fe_pow(a,e):
+    table = [fe_constant(1,a.shape[1]),a]
+    for i in range(14):
+        table.append(fe_mul(table[-1],a))
+    result = None
+    for i in range((e.bit_length() + 3)//4 - 1,-1,-1):
+        if result is not None:
+            for j in range(4):
+                result = fe_mul(result,result)
+        digit = (e >> (4*i)) & 15
+        if result is None:
+            result = table[digit].copy()
+        elif digit > 0:
+            result = fe_mul(result,table[digit])
+    return result
+
+# Batch of n copies of an integer
+def fe_constant(c,n):
+    return numpy.repeat(fe_from_ints([c]),n,axis=1)
+
+# Batch from little-endian 64-bit words, shape (n,4); bit 255 is ignored
+def fe_from_words(words):
+    h = numpy.empty((10,len(words)),dtype=numpy.int64)
+    for i in range(10):
+        k,s = divmod(fe_offsets[i],64)
+        limb = words[:,k] >> numpy.uint64(s)
+        if s + fe_widths[i] > 64:
+            limb |= words[:,k+1] << numpy.uint64(64-s)
+        h[i] = (limb & numpy.uint64((1 << fe_widths[i]) - 1)).astype(numpy.int64)
+    return h
+
+# Batch from a list of integers
+def fe_from_ints(values):
+    data = b''.join((x % q).to_bytes(b//8,'little') for x in values)
+    return fe_from_words(numpy.frombuffer(data,dtype='<u8').reshape(-1,4))
+
+# Fully reduce a batch: each column becomes the canonical representative in [0,q) (ref10 fe_tobytes)
+def fe_canonical(a):
+    h = fe_carry(a.copy())
+    carry = (19*h[9] + (1 << 24)) >> 25
+    for i in range(10):
+        carry = (h[i] + carry) >> fe_widths[i]
+    h[0] += 19*carry
+    for i in range(9):
+        carry = h[i] >> fe_widths[i]
+        h[i+1] += carry
+        h[i] -= carry << fe_widths[i]
+    h[9] &= (1 << 25) - 1
+    return h
+
+# Integers from a batch
+def fe_to_ints(a):
+    h = fe_canonical(a).astype(numpy.uint64)
+    words = numpy.zeros((h.shape[1],4),dtype=numpy.uint64)
+    for i in range(10):
+        k,s = divmod(fe_offsets[i],64)
+        words[:,k] |= h[i] << numpy.uint64(s)
+        if s + fe_widths[i] > 64:
+            words[:,k+1] |= h[i] >> numpy.uint64(64-s)
+    data = words.astype('<u8').tobytes()
+    return [int.from_bytes(data[i:i+b//8],'little') for i in range(0,len(data),b//8)]
+
+# Columnwise equality of two batches, as a boolean array
+def fe_equal(a,c):
+    return (fe_canonical(a-c) == 0).all(axis=0)
+
+# Batch Point addition in extended coordinates; Points are (X,Y,Z,T) tuples of batches
+def fe_point_add(P,Q):
+    A = fe_mul(P[1]-P[0],Q[1]-Q[0])
+    B = fe_mul(P[1]+P[0],Q[1]+Q[0])
+    C = fe_mul(fe_mul(P[3],fe_constant(d2,P[3].shape[1])),Q[3])
+    D = fe_carry(2*fe_mul(P[2],Q[2]))
+    E = B-A
+    F = D-C
+    G = D+C
+    H = B+A
+    return (fe_mul(E,F),fe_mul(G,H),fe_mul(F,G),fe_mul(E,H))
+
+# Batch Point doubling in extended coordinates
+def fe_point_double(P):
+    A = fe_mul(P[0],P[0])
+    B = fe_mul(P[1],P[1])
+    C = fe_carry(2*fe_mul(P[2],P[2]))
+    E = fe_carry(fe_mul(P[0]+P[1],P[0]+P[1]) - A - B)
+    G = B-A
+    F = fe_carry(G-C)
+    H = -A-B
+    return (fe_mul(E,F),fe_mul(G,H),fe_mul(F,G),fe_mul(E,H))
+
+# Batch of the extended coordinates of a list of Points
+def fe_points(points):
+    return tuple(fe_from_ints([getattr(P,coordinate) for P in points]) for coordinate in 'XYZT')
+
+# Normalized Points from a batch, sharing a single inversion
+def fe_to_points(P):
+    Z = batch_invert(fe_to_ints(P[2]),q)
+    Z = fe_from_ints(Z)
+    X = fe_mul(P[0],Z)
+    Y = fe_mul(P[1],Z)
+    T = fe_mul(X,Y)
+    return [extended(x,y,1,t) for x,y,t in zip(fe_to_ints(X),fe_to_ints(Y),fe_to_ints(T))]
+
+# Batch scalar multiplication of each Point by its own nonnegative integer below 2**256, with fixed 4-bit windows
+# Lanes are processed in blocks of fe_mul_block, since each needs a table of 16 Points (about 10 KB with temporaries)
+def fe_point_mul(P,values):
+    n = len(values)
+    if n > fe_mul_block:
+        blocks = [fe_point_mul(tuple(c[:,i:i+fe_mul_block] for c in P),values[i:i+fe_mul_block]) for i in range(0,n,fe_mul_block)]
+        return tuple(numpy.concatenate([block[c] for block in blocks],axis=1) for c in range(4))
+    lanes = numpy.arange(n)
+    data = b''.join(k.to_bytes(b//8,'little') for k in values)
+    nibbles = numpy.frombuffer(data,dtype=numpy.uint8).reshape(n,b//8)
+    nibbles = numpy.stack([nibbles & 15,nibbles >> 4],axis=2).reshape(n,b//4).astype(numpy.int64)
+
+    # table[j] = j*P for each lane, stacked as shape (16,4,10,n)
+    table = [(fe_constant(0,n),fe_constant(1,n),fe_constant(1,n),fe_constant(0,n)),P]
+    for j in range(14):
+        table.append(fe_point_add(table[-1],P))
+    table = numpy.stack([numpy.stack(entry) for entry in table])
+
+    result = None
+    for i in range(b//4-1,-1,-1):
+        if result is not None:
+            for j in range(4):
+                result = fe_point_double(result)
+        entry = table[nibbles[:,i],:,:,lanes] # shape (n,4,10)
+        entry = tuple(numpy.ascontiguousarray(entry[:,c,:].T) for c in range(4))
+        result = entry if result is None else fe_point_add(result,entry)
+    return result
+
+# Decode 32-byte Point encodings in a batch, one batched exponentiation for all of them
+# Raises ValueError if any of them is not canonical or not on the curve
+def fe_decompress(encodings):
+    n = len(encodings)
+    words = numpy.frombuffer(b''.join(encodings),dtype='<u8').reshape(n,4).copy()
+    sign = (words[:,3] >> numpy.uint64(63)).astype(bool)
+    words[:,3] &= numpy.uint64(2**63 - 1)
+    top = numpy.uint64(2**64 - 1)
+    if ((words[:,3] == numpy.uint64(2**63 - 1)) & (words[:,2] == top) & (words[:,1] == top) & (words[:,0] >= numpy.uint64(2**64 - 19))).any():
+        raise ValueError # y >= q
+
+    # x = sqrt(u/v) with u = y^2 - 1 and v = d*y^2 + 1, as in sqrt_ratio
+    y = fe_from_words(words)
+    one = fe_constant(1,n)
+    yy = fe_mul(y,y)
+    u = fe_carry(yy - one)
+    v = fe_carry(fe_mul(yy,fe_constant(d,n)) + one)
+    v3 = fe_mul(fe_mul(v,v),v)
+    uv3 = fe_mul(u,v3)
+    x = fe_mul(uv3,fe_pow(fe_mul(fe_mul(uv3,v3),v),(q-5)//8))
+    vxx = fe_mul(v,fe_mul(x,x))
+    root = fe_equal(vxx,u)
+    flipped = fe_equal(vxx,-u)
+    if not (root | flipped).all():
+        raise ValueError
+    x = numpy.where(flipped & ~root,fe_mul(x,fe_constant(I,n)),x)
+
+    # pick the root with the encoded parity
+    x = fe_canonical(x)
+    if ((x == 0).all(axis=0) & sign).any():
+        raise ValueError
+    x = numpy.where((x[0] & 1).astype(bool) != sign,fe_carry(-x),x)
+    xs = fe_to_ints(x)
+    ys = fe_to_ints(y)
+    points = []
+    for i in range(n):
+        P = extended(xs[i],ys[i],1,(xs[i]*ys[i]) % q)
+        P.encoded = encodings[i]
+        points.append(P)
+    return points
+
+# Window size for a Pippenger multiscalar multiplication of n terms with scalars of the given bit length
+# Each of the ~bits/c groups costs n bucket additions plus about 2**c to sum the 2**(c-1) signed buckets
+def pippenger_window(n,bits=b):
+    return min(range(2,17),key=lambda c: ((bits+1) // c + 1) * (n + 2**c))
+
+# Signed base-2**c digits (c >= 2) of a nonnegative integer, least significant first, each in [-2**(c-1),2**(c-1))
+def signed_digits(k,c,groups):
+    digits = []
+    mask = (1 << c) - 1
+    half = 1 << (c-1)
+    carry = 0
+    for i in range(groups):
+        digit = (k & mask) + carry
+        k >>= c
+        carry = (digit + half) >> c
+        digits.append(digit - (carry << c))
+    return digits
+
+# Multiscalar multiplication of Points by nonnegative integers using the Pippenger bucket algorithm with signed digits
+def pippenger(values,points):
+    bits = max(values).bit_length()
+    if bits == 0:
+        return Z
+
+    # recode every scalar once, with enough groups that the top digit never carries
+    c = pippenger_window(len(values),bits)
+    groups = (bits+1) // c + 1
+    digits = [signed_digits(k,c,groups) for k in values]
+
+    # normalize the Points with a single inversion, so that buckets can use mixed additions
+    triples = niels(points)
+    negated = [(ymx,ypx,-t2d % q) for ypx,ymx,t2d in triples]
+
+    result = None
+    for k in range(groups-1,-1,-1):
+        if result is not None:
+            for i in range(c):
+                result = result.double()
+
+        # buckets[j] collects the Points whose digit is +-(j+1), in extended coordinates
+        buckets = [None]*(1 << (c-1))
+        for i in range(len(values)):
+            digit = digits[i][k]
+            if digit > 0:
+                j = digit-1
+                buckets[j] = (points[i].X,points[i].Y,1,points[i].T) if buckets[j] is None else madd(buckets[j],triples[i])
+            elif digit < 0:
+                j = -digit-1
+                buckets[j] = (-points[i].X % q,points[i].Y,1,-points[i].T % q) if buckets[j] is None else madd(buckets[j],negated[i])
+
+        # sum the buckets with weights j+1 using running sums
+        pail = None
+        total = None
+        for j in range(len(buckets)-1,-1,-1):
+            if buckets[j] is not None:
+                pail = extended(*buckets[j]) if pail is None else pail + extended(*buckets[j])
+            if pail is not None:
+                total = pail if total is None else total + pail
+        if total is not None:
+            result = total if result is None else result + total
+
+    if result is None:
+        return Z
+    return result
+
+# Multiscalar multiplication of Points by nonnegative integers using interleaved wNAF (Straus)
+# All terms share one doubling chain, and each Point gets its own table of odd multiples
+def straus(values,points):
+    bits = max(values).bit_length()
+    if bits == 0:
+        return Z
+    w = 4 if bits <= 128 else wnaf_window
+    nafs = [wnaf(k,w) for k in values]
+    tables = [odd_multiples(points[i],max(abs(digit) for digit in nafs[i]) >> 1) if nafs[i] else None for i in range(len(values))]
+
+    result = None
+    for k in range(bits,-1,-1):
+        if result is not None:
+            result = result.double()
+        for i in range(len(values)):
+            if k >= len(nafs[i]):
+                continue
+            digit = nafs[i][k]
+            if digit > 0:
+                T = tables[i][digit >> 1]
+                result = T if result is None else result + T
+            elif digit < 0:
+                T = tables[i][-digit >> 1]
+                result = -T if result is None else result - T
+
+    if result is None:
+        return Z
+    return result
+
+# Multiscalar multiplication of Points by nonnegative integers using the Bos-Coster algorithm
+# The two largest scalars a >= b are repeatedly reduced via aP + bQ = (a mod b)P + b(Q + (a//b)P)
+def bos_coster(values,points):
+    heap = [(-values[i],i,points[i]) for i in range(len(values)) if values[i] > 0]
+    if len(heap) == 0:
+        return Z
+    heapq.heapify(heap)
+
+    while len(heap) > 1:
+        a,i,P = heapq.heappop(heap)
+        a = -a
+        b,j,Q = heap[0]
+        b = -b
+        quotient = a // b
+        heap[0] = (-b,j,Q + (P if quotient == 1 else wnaf_mul(P,quotient,wnaf_window)))
+        if a % b > 0:
+            heapq.heappush(heap,(-(a % b),i,P))
+
+    a,i,P = heap[0]
+    return wnaf_mul(P,-a,wnaf_window)
+
+# Multiscalar multiplication algorithms, by name
+multiexp_algorithms = {
+    'straus': straus,
+    'bos_coster': bos_coster,
+    'pippenger': pippenger
+}
+
+# Crossover points for multiexp, keyed by scalar bit length
+# For scalars of at most `bits` bits, Straus is used for up to straus_max terms, then Bos-Coster for
+# up to bos_coster_max terms, then Pippenger; the defaults come from calibrate_multiexp() runs (Pippenger
+# wins from about 33 terms at every bit length) and can be re-measured on another machine
+multiexp_crossovers = {
+    64: (4,32),
+    128: (8,32),
+    b: (16,32)
+}
+
+# Number of worker processes used by multiexp; 1 keeps every multiscalar multiplication in this process
+multiexp_workers = 1
+
+# Smallest number of terms for which multiexp splits the work across worker processes (None to never do so)
+# Below this, shipping the terms costs more than it saves; the default is an uncalibrated placeholder
+# (it was chosen on a single-core machine), so run calibrate_parallel_multiexp() before relying on it
+multiexp_parallel_threshold = 8192
+
+# Worker processes shared by multiexp and batch_mul, started on first use (see worker_pool)
+pool = None
+pool_workers = 0
+
+# The shared pool of worker processes, (re)started if it has a different number of workers
+def worker_pool(workers):
+    global pool,pool_workers
+    if pool is None or pool_workers != workers:
+        shutdown_worker_pool()
+        pool = ProcessPoolExecutor(workers)
+        pool_workers = workers
+    return pool
+
+# Stop the shared worker processes, if they were started
+def shutdown_worker_pool():
+    global pool,pool_workers
+    if pool is not None:
+        pool.shutdown()
+        pool = None
+        pool_workers = 0
+
+# Choose a multiscalar multiplication algorithm for n terms whose largest scalar has the given bit length
+def multiexp_algorithm(n,bits,crossovers=None):
+    if crossovers is None:
+        crossovers = multiexp_crossovers
+    bands = sorted(crossovers)
+    band = bands[-1]
+    for i in bands:
+        if bits <= i:
+            band = i
+            break
+    straus_max,bos_coster_max = crossovers[band]
+    if n <= straus_max:
+        return 'straus'
+    if n <= bos_coster_max:
+        return 'bos_coster'
+    return 'pippenger'
+
+# Benchmark the multiscalar multiplication algorithms to find their crossover points on this machine
+# Sets and returns multiexp_crossovers
+def calibrate_multiexp(sizes=(2,4,8,16,32,64,128,256,512,1024),bands=(64,128,b),repeat=1):
+    global multiexp_crossovers
+    points = [random_scalar()*G for i in range(max(sizes))]
+    crossovers = {}
+    for bits in bands:
+        straus_max = 0
+        bos_coster_max = 0
+        straus_winning = True
+        for n in sorted(sizes):
+            values = [secrets.randbits(bits) % l for i in range(n)]
+            times = {}
+            for name in multiexp_algorithms:
+                start = time.perf_counter()
+                for i in range(repeat):
+                    multiexp_algorithms[name](values,points[:n])
+                times[name] = time.perf_counter() - start
+            fastest = min(times,key=times.get)
+
+            # Straus only for the sizes below its first loss; Bos-Coster up to the last Pippenger loss
+            straus_winning = straus_winning and fastest == 'straus'
+            if straus_winning:
+                straus_max = n
+            if fastest != 'pippenger':
+                bos_coster_max = n
+        crossovers[bits] = (straus_max,max(straus_max,bos_coster_max))
+    multiexp_crossovers = crossovers
+    return crossovers
+
+# Multiscalar multiplication of Points by nonnegative integers in this process
+def serial_multiexp(values,points,algorithm=None,crossovers=None):
+    if algorithm is None:
+        algorithm = multiexp_algorithm(len(values),max(values).bit_length(),crossovers)
+    return multiexp_algorithms[algorithm](values,points)
+
+# Pack Points as 64-byte affine encodings (x and y, little-endian), normalizing them with a single inversion
+# Unlike 32-byte encodings, these can be loaded without a square root
+def pack_affine(points):
+    batch_normalize(points)
+    return b''.join(P.X.to_bytes(b//8,'little') + P.Y.to_bytes(b//8,'little') for P in points)
+
+# Load Points from 64-byte affine encodings produced by pack_affine (which are trusted, and not validated)
+def unpack_affine(data):
+    points = []
+    for i in range(0,len(data),b//4):
+        x = int.from_bytes(data[i:i+b//8],'little')
+        y = int.from_bytes(data[i+b//8:i+b//4],'little')
+        points.append(extended(x,y,1,(x*y) % q))
+    return points
+
+# Worker for parallel_multiexp: a multiscalar multiplication of packed 32-byte scalars and 64-byte affine Points
+# Returns the 32-byte encoding of the partial sum
+def multiexp_worker(scalars,points,algorithm,crossovers):
+    values = [int.from_bytes(scalars[i:i+b//8],'little') for i in range(0,len(scalars),b//8)]
+    if max(values) == 0:
+        return Z.to_bytes()
+    return serial_multiexp(values,unpack_affine(points),algorithm,crossovers).to_bytes()
+
+# Multiscalar multiplication of Points by nonnegative integers, split into one chunk of terms per worker process
+# Each worker runs a multiscalar multiplication on its chunk, and the partial sums are added
+def parallel_multiexp(values,points,workers,algorithm=None,crossovers=None):
+    if crossovers is None:
+        crossovers = multiexp_crossovers # workers may not share this module's state
+    size = -(-len(values) // workers)
+    points = pack_affine(points)
+    futures = [worker_pool(workers).submit(
+        multiexp_worker,
+        b''.join(k.to_bytes(b//8,'little') for k in values[i:i+size]),
+        points[i*(b//4):(i+size)*(b//4)],
+        algorithm,
+        crossovers
+    ) for i in range(0,len(values),size)]
+    partials = [Point.from_bytes(future.result()) for future in futures]
+
+    result = partials[0]
+    for P in partials[1:]:
+        result += P
+    return result
+
+# Benchmark serial and parallel multiscalar multiplication to find the size from which parallel is faster
+# Sets and returns multiexp_parallel_threshold (None if parallel never wins at the given sizes)
+def calibrate_parallel_multiexp(workers=None,sizes=(1024,2048,4096,8192,16384,32768),repeat=1):
+    global multiexp_parallel_threshold
+    if workers is None:
+        workers = os.cpu_count()
+    points = [random_scalar()*G for i in range(max(sizes))]
+    threshold = None
+    for n in sorted(sizes,reverse=True):
+        values = [random_scalar().x for i in range(n)]
+        start = time.perf_counter()
+        for i in range(repeat):
+            serial_multiexp(values,points[:n])
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(repeat):
+            parallel_multiexp(values,points[:n],workers)
+        parallel = time.perf_counter() - start
+
+        # parallel only from the smallest size above which it always wins
+        if parallel >= serial:
+            break
+        threshold = n
+    multiexp_parallel_threshold = threshold
+    return threshold
+
+# Perform a multiscalar multiplication
+# The algorithm is chosen from the number of terms and the scalar bit length, unless given explicitly;
+# `crossovers` overrides the module-level multiexp_crossovers for this call
+# With more than one worker (`workers`, or multiexp_workers by default), inputs of at least
+# multiexp_parallel_threshold terms are split across that many processes
+def multiexp(scalars,points,algorithm=None,crossovers=None,workers=None):
     if not isinstance(scalars,ScalarVector) or not isinstance(points,PointVector):
         raise TypeError
 
@@ -558,46 +1838,309 @@ def multiexp(scalars,points):
     if len(scalars) == 0:
         return Z
 
-    buckets = None
-    result = Z # zero point
-   
-    c = 4 # window parameter; NOTE: the optimal value actually depends on len(points) empirically
-
-    # really we want to use the max bitlength to compute groups
-    maxscalar = int(max(scalars))
-    groups = 0
-    while maxscalar >= 2**groups:
-        groups += 1
-    groups = int((groups + c - 1) / c)
-    
-    # loop is really (groups-1)..0
-    for k in range(groups-1,-1,-1):
-        if result != Z:
-            for i in range(c):
-                result += result
-        
-        buckets = [Z]*(2**c) # clear all buckets
-        
-        # partition scalars into buckets
-        for i in range(len(scalars)):
-            bucket = 0
-            for j in range(c):
-                if int(scalars[i]) & (1 << (k*c+j)): # test for bit
-                    bucket |= 1 << j
-            
-            if bucket == 0: # zero bucket is never used
-                continue
-            
-            if buckets[bucket] != Z:
-                buckets[bucket] += points[i]
+    values = scalars.values
+    if algorithm is not None and algorithm not in multiexp_algorithms:
+        raise ValueError
+    if max(values) == 0:
+        return Z
+    if workers is None:
+        workers = multiexp_workers
+    if workers > 1 and multiexp_parallel_threshold is not None and len(values) >= multiexp_parallel_threshold:
+        return parallel_multiexp(values,points.points,workers,algorithm,crossovers)
+    return serial_multiexp(values,points.points,algorithm,crossovers)
+
+# Number of worker processes used by batch_mul; 1 keeps every scalar multiplication in this process
+batch_mul_workers = 1
+
+# Number of Points handled by each batch_mul task; a multiple of numpy_threshold, so that chunks can use NumPy
+batch_mul_chunk_size = 4*numpy_threshold
+
+# Scalar multiplications of Points by their own nonnegative integers, normalized with a single shared inversion
+def hadamard_mul(points,values):
+    if use_numpy(len(points)):
+        return fe_to_points(fe_point_mul(fe_points(points),values))
+    return batch_normalize([points[i]*reduced(values[i]) for i in range(len(points))])
+
+# Worker for batch_mul: scalar multiplications of 64-byte affine Points by packed 32-byte scalars
+# Returns the products as 64-byte affine encodings
+def batch_mul_worker(points,scalars):
+    values = [int.from_bytes(scalars[i:i+b//8],'little') for i in range(0,len(scalars),b//8)]
+    return pack_affine(hadamard_mul(unpack_affine(points),values))
+
+# Multiply each Point of a PointVector by its own Scalar from a ScalarVector, or all of them by one Scalar
+# The Points are split into chunks of chunk_size (batch_mul_chunk_size by default), which bounds the memory
+# of the NumPy backend; with more than one worker (`workers`, or batch_mul_workers by default), the chunks
+# are spread across that many processes
+# Each chunk of products is normalized with a single shared inversion
+def batch_mul(points,scalars,workers=None,chunk_size=None):
+    if not isinstance(points,PointVector):
+        raise TypeError
+    if isinstance(scalars,Scalar):
+        values = [scalars.x]*len(points)
+    elif isinstance(scalars,ScalarVector):
+        if len(scalars) != len(points):
+            raise IndexError
+        values = scalars.values
+    else:
+        raise TypeError
+
+    if workers is None:
+        workers = batch_mul_workers
+    if chunk_size is None:
+        chunk_size = batch_mul_chunk_size
+    if chunk_size < 1:
+        raise ValueError
+    chunks = range(0,len(values),chunk_size)
+    if workers <= 1 or len(values) <= chunk_size:
+        return PointVector([P for i in chunks for P in hadamard_mul(points.points[i:i+chunk_size],values[i:i+chunk_size])])
+
+    packed = pack_affine(points.points)
+    results = worker_pool(workers).map(
+        batch_mul_worker,
+        [packed[i*(b//4):(i+chunk_size)*(b//4)] for i in chunks],
+        [b''.join(k.to_bytes(b//8,'little') for k in values[i:i+chunk_size]) for i in chunks]
+    )
+    return PointVector([P for data in results for P in unpack_affine(data)])
+
+# Key for a Point in a KeyImageIndex: the encoding of 8 times the Point, so that all 8 torsion variants of a
+# key image share a key; 8 times a Point never has the all-zero encoding, which marks empty slots
+def key_image_key(P):
+    return P.double().double().double().to_bytes()
+
+# Keys for a list of Points (see key_image_key), normalized with a single shared inversion
+def key_image_keys(points):
+    return [P.to_bytes() for P in batch_normalize([P.double().double().double() for P in points])]
+
+# A set of key images, keyed by their cofactor-cleared encodings (see key_image_key)
+# The keys are stored in an open-addressing table with linear probing, as consecutive 32-byte slots of a
+# bytearray, or of a memory-mapped file if a path is given (an existing file is opened, otherwise one is created)
+# The file holds a 32-byte header (magic, count, capacity) followed by the slots
+class KeyImageIndex:
+    magic = b'dumbKII1'
+    header = 32
+    empty = bytes(b//8)
+
+    def __init__(self,capacity=1024,path=None):
+        if not isinstance(capacity,int) or capacity < 1:
+            raise ValueError
+        self.file = None
+        self.path = path
+        if path is not None and os.path.exists(path):
+            self.file = open(path,'r+b')
+            self.table = mmap.mmap(self.file.fileno(),0)
+            if self.table[:8] != self.magic:
+                self.close()
+                raise ValueError
+            self.count = int.from_bytes(self.table[8:16],'little')
+            self.capacity = int.from_bytes(self.table[16:24],'little')
+            if len(self.table) != self.header + self.capacity*(b//8):
+                self.close()
+                raise ValueError
+            return
+
+        self.count = 0
+        self.capacity = 1 << (capacity-1).bit_length() # a power of two
+        if path is None:
+            self.table = bytearray(self.header + self.capacity*(b//8))
+        else:
+            self.file = open(path,'w+b')
+            self.file.truncate(self.header + self.capacity*(b//8))
+            self.table = mmap.mmap(self.file.fileno(),0)
+        self.write_header()
+
+    def write_header(self):
+        self.table[:self.header] = self.magic + self.count.to_bytes(8,'little') + self.capacity.to_bytes(8,'little') + bytes(8)
+
+    # Slot of a key, or of the empty slot where it would go, and whether the key was found
+    def find(self,key):
+        mask = self.capacity-1
+        i = int.from_bytes(blake2b(key,digest_size=8).digest(),'little') & mask
+        while True:
+            offset = self.header + i*(b//8)
+            slot = self.table[offset:offset+b//8]
+            if slot == key:
+                return i,True
+            if slot == self.empty:
+                return i,False
+            i = (i+1) & mask
+
+    # Insert a key, growing the table to keep it at most 3/4 full; returns whether the key is new
+    def insert(self,key):
+        i,found = self.find(key)
+        if found:
+            return False
+        if 4*(self.count+1) > 3*self.capacity:
+            self.resize(2*self.capacity)
+            i,found = self.find(key)
+        offset = self.header + i*(b//8)
+        self.table[offset:offset+b//8] = key
+        self.count += 1
+        self.table[8:16] = self.count.to_bytes(8,'little')
+        return True
+
+    # Rebuild the table with a new capacity (a power of two, and large enough for the keys)
+    # With a file, the keys are rehashed slot by slot from the old mapping into a new (zero-filled) file,
+    # which then replaces the old one, so the table is never copied into memory
+    def resize(self,capacity):
+        old = self.table
+        slots = self.capacity
+        size = self.header + capacity*(b//8)
+        if self.file is None:
+            self.table = bytearray(size)
+        else:
+            file = open(self.path + '.tmp','w+b')
+            file.truncate(size)
+            self.table = mmap.mmap(file.fileno(),0)
+        self.capacity = capacity
+        for i in range(slots):
+            offset = self.header + i*(b//8)
+            key = old[offset:offset+b//8]
+            if key != self.empty:
+                j,found = self.find(key)
+                offset = self.header + j*(b//8)
+                self.table[offset:offset+b//8] = key
+        self.write_header()
+
+        if self.file is not None:
+            self.table.flush()
+            old.close()
+            self.file.close()
+            os.replace(self.path + '.tmp',self.path)
+            self.file = file
+
+    # Add a key image; returns whether it is new (that is, no torsion variant of it was already present)
+    def add(self,P):
+        if not isinstance(P,Point):
+            raise TypeError
+        return self.insert(key_image_key(P))
+
+    # Add a list or PointVector of key images; returns whether each was new
+    # A key image that repeats one earlier in the same list is not new
+    def add_all(self,points):
+        if isinstance(points,PointVector):
+            points = points.points
+        for P in points:
+            if not isinstance(P,Point):
+                raise TypeError
+        return [self.insert(key) for key in key_image_keys(points)]
+
+    # Membership of a key image (or of any of its torsion variants)
+    def __contains__(self,P):
+        if not isinstance(P,Point):
+            raise TypeError
+        return self.find(key_image_key(P))[1]
+
+    # Membership of each of a list or PointVector of key images
+    def contains_all(self,points):
+        if isinstance(points,PointVector):
+            points = points.points
+        for P in points:
+            if not isinstance(P,Point):
+                raise TypeError
+        return [self.find(key)[1] for key in key_image_keys(points)]
+
+    # Number of key images
+    def __len__(self):
+        return self.count
+
+    # Write changes through to the file, if there is one
+    def flush(self):
+        if self.file is not None:
+            self.table.flush()
+
+    # Flush and release the file, if there is one
+    def close(self):
+        if self.file is not None:
+            self.table.flush()
+            self.table.close()
+            self.file.close()
+            self.file = None
+            self.table = None
+
+# A vector of generators hash_to_point(label,i) for i = 0,...,n-1, derived once and kept in a memory-mapped file
+# The file holds a 64-byte header (magic, count, metadata length, checksum), the label and hash mode, and
+# the packed Point encodings; the checksum covers all of these
+# If the file is missing, damaged, or was derived with a different label or hash mode, it is rebuilt; if it
+# holds too few generators, only the missing ones are derived
+# The Points are decoded lazily, when they are used (see PointVector.from_buffer)
+class GeneratorStore:
+    magic = b'dumbGEN1'
+    header = 64
+
+    def __init__(self,path,label,n,mode=None):
+        if not isinstance(n,int) or n < 0:
+            raise ValueError
+        if mode is None:
+            mode = hash_mode
+        self.path = path
+        self.label = label
+        self.mode = mode
+        self.metadata = (str(label) + '\0' + mode).encode('utf-8')
+        self.file = None
+        self.table = None
+
+        count = self.load()
+        if self.table is None or count < n: # the file could not be used, or is too short
+            if count > 0:
+                encodings = self.table[self.start:self.start + count*(b//8)]
             else:
-                buckets[bucket] = points[i]
-        
-        # sum the buckets
-        pail = Z
-        for i in range(len(buckets)-1,0,-1):
-            if buckets[i] != Z:
-                pail += buckets[i]
-            if pail != Z:
-                result += pail
-    return result
+                encodings = b''
+            self.close()
+            self.save(encodings + PointVector([hash_to_point(label,i,mode=mode) for i in range(count,n)]).to_buffer())
+            count = self.load()
+        self.n = n
+        self.points = PointVector.from_buffer(memoryview(self.table)[self.start:self.start + n*(b//8)])
+
+    # Checksum of the metadata and encodings
+    def checksum(self,encodings):
+        return blake2b(self.metadata + len(self.metadata).to_bytes(8,'little') + encodings,digest_size=32).digest()
+
+    # Map the file, returning how many generators it holds for this label and mode (0 if it cannot be used)
+    def load(self):
+        self.start = self.header + len(self.metadata)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.start:
+            return 0
+        self.file = open(self.path,'rb')
+        self.table = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+        count = int.from_bytes(self.table[8:16],'little')
+        if (self.table[:8] != self.magic
+                or int.from_bytes(self.table[16:24],'little') != len(self.metadata)
+                or self.table[self.header:self.start] != self.metadata
+                or len(self.table) != self.start + count*(b//8)
+                or self.table[32:64] != self.checksum(self.table[self.start:])):
+            self.close()
+            return 0
+        return count
+
+    # Write a new file from packed encodings, replacing any existing one
+    def save(self,encodings):
+        count = len(encodings) // (b//8)
+        header = self.magic + count.to_bytes(8,'little') + len(self.metadata).to_bytes(8,'little') + bytes(8) + self.checksum(encodings)
+        with open(self.path + '.tmp','wb') as file:
+            file.write(header + self.metadata + encodings)
+        os.replace(self.path + '.tmp',self.path)
+
+    # Release the file
+    # If the `points` PointVector of the store is still held and not fully decoded, the mapping is only
+    # released along with it
+    def close(self):
+        if self.table is not None:
+            self.points = None
+            try:
+                self.table.close()
+            except BufferError:
+                pass
+            self.file.close()
+            self.table = None
+            self.file = None
+
+    # Number of generators
+    def __len__(self):
+        return self.n
+
+    # Get a generator, or a slice of them as a PointVector
+    # Slices are copied out of the file (and still decoded lazily), so they stay usable after close()
+    def __getitem__(self,i):
+        if isinstance(i,slice):
+            return PointVector.from_buffer(self.points[i].to_buffer())
+        return self.points[i]
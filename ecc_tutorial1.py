@@ -116,6 +116,8 @@ print("Hash point: " + str(yet_another_point))
 #     Alice and Bob wants to share a secret scalar only they would know.
 #     Using the generator G and dumb25519.hash_to_scalar(), how would they do it?
 # show that after the key exchange, Alice and Bob has a shared secret.
+# (once it works, compare with dumb25519.x25519() and dumb25519.x25519_public(), which exchange only
+# Montgomery u-coordinates and are what you would use for many short-lived sessions)
 
 # <your code here>
 
@@ -131,7 +133,9 @@ print("Hash point: " + str(yet_another_point))
 # then demonstrate the homomorphicity of Pedersen commitment: show that
 # pedersen(x1) + pedersen(x2) = (r1 + r2)G + (x1 + x2)H where r1 and r2 are the 'r' output of
 # pedersen(x1) and pedersen(x2), respectively.
-H = dumb25519.hash_to_point("Pedersen")
+# note: dumb25519.precompute() returns the same point H, but with a cached table that
+# makes multiplying it by scalars (like we do a lot here) much faster.
+H = dumb25519.precompute(dumb25519.hash_to_point("Pedersen"))
 
 def pedersen(amount):
     # <your code here>
@@ -86,12 +86,13 @@ actual_secret = Scalar(123456789)
 #    * coeff: ScalarVector of coefficients
 # note: coeff[0] corresponds to x ** 0 = 1, coeff[1] corresponds to x ** 1 = x,
 #       coeff[2] corresponds to x ** 2, etc.
+# this uses Horner's rule: poly(x) = coeff[0] + x * (coeff[1] + x * (coeff[2] + ...)), so no powers of x
+# are needed (polynomial.evaluate_many() does this for all players at once)
 def poly_eval(x: Scalar, coeff: ScalarVector) -> Scalar:
-    powers_x = ScalarVector()
-    powers_x.append(Scalar(1))
-    for i in range(len(coeff) - 1):
-        powers_x.append(x * powers_x[i])
-    return powers_x ** coeff
+    result = Scalar(0)
+    for i in range(len(coeff) - 1, -1, -1):
+        result = result * x + coeff[i]
+    return result
 
 # list of n = 5 'players'/x-coord of share coords
 # note: Scalar(0) is not allowed in player_list because poly(0) = secret (which leaks the secret)
@@ -106,6 +107,7 @@ player_list = [Scalar(1), Scalar(2), Scalar(3), Scalar(4), Scalar(5)]
 # https://en.wikipedia.org/wiki/Shamir%27s_Secret_Sharing#Computationally_efficient_approach
 #    * coords: set of coords for recovery
 # note: our "division" is (x1 * x2.invert()), NOT (x1 // x2) !!!
+# (once yours works, compare with polynomial.interpolate_at_zero(), which needs only one inversion)
 def recover(coords: list) -> Scalar:
     # <your code here>
     pass
@@ -1,7 +1,8 @@
 # elliptic curve cryptography tutorial/playground (part 3)
 
-from dumb25519 import Scalar, Point
+from dumb25519 import Scalar, ScalarVector, Point, PointVector
 import dumb25519
+import secrets
 
 # unlike part 1 and part 2 tutorials, this tutorial is not much about
 # the elliptic curve stuff. instead, this is about proving systems.
@@ -71,6 +72,9 @@ class NISchnorrProof:
         # challenge. hence, the challenge instead should be the hash of the
         # partial proof data. this trick is called "Fiat-Shamir heuristic".
         c = dumb25519.hash_to_scalar("Schnorr Proof", self.P, self.Q)   # yeah, not in self!
+        # note: protocols with many rounds usually keep a running dumb25519.Transcript instead:
+        # messages are appended as they are "sent", and each challenge comes from
+        # transcript.challenge_scalar() without hashing the earlier messages again.
 
         # let self.s = r + c * x.
         # <your code here>
@@ -83,6 +87,43 @@ class NISchnorrProof:
         # <your code here>
         pass
 
+# batch verification: a verifier that receives many NISchnorrProofs (say, a whole block
+# of transactions) doesn't have to check them one by one. she picks a random weight z_i
+# for each proof and checks the single combined equation
+#     (sum z_i * s_i) * G == sum (z_i * Q_i + z_i * c_i * P_i)
+# which is one fixed-base multiplication and one multiscalar multiplication (see part 2).
+# if every proof is valid, the combined equation holds. if some proof is invalid, the
+# random weights make the combined equation fail except with negligible probability,
+# and only then does she fall back to checking each proof on its own.
+# careful: the weights only act on the main subgroup part of each point. a small-order
+# (torsion) component is only multiplied by the weight modulo 8, so an even weight can hide
+# an order-2 component (see part 4). so both the combined equation and the per-proof fallback
+# are "cofactored": they are multiplied by 8 (three doublings), which removes small-order
+# components. a proof passes batch_verify() exactly when 8 * (s * G - Q - c * P) is zero,
+# which is slightly weaker than verify() (it also accepts proofs that are off by a small-order
+# point), but the batch and its fallback always agree.
+#    * proofs: list of NISchnorrProof
+# returns the indexes of the invalid proofs (an empty list if all of them are valid)
+def batch_verify(proofs: list) -> list:
+    if len(proofs) == 0:
+        return []
+    challenges = [dumb25519.hash_to_scalar("Schnorr Proof", proof.P, proof.Q) for proof in proofs]
+    cofactored = lambda R: R.double().double().double() == dumb25519.Z   # 8 * R == Z
+    single = lambda i: cofactored(proofs[i].s * dumb25519.G - proofs[i].Q - challenges[i] * proofs[i].P)
+
+    # 128-bit weights are enough to make cheating negligible, and keep the multiexp short
+    weights = [Scalar(secrets.randbits(128)) for proof in proofs]
+    s_sum = Scalar(0)
+    for i in range(len(proofs)):
+        s_sum += weights[i] * proofs[i].s
+    scalars = ScalarVector(weights + [weights[i] * challenges[i] for i in range(len(proofs))])
+    points = PointVector([proof.Q for proof in proofs] + [proof.P for proof in proofs])
+    if cofactored(s_sum * dumb25519.G - dumb25519.multiexp(scalars, points)):
+        return []
+
+    # the batch failed: find the culprits
+    return [i for i in range(len(proofs)) if not single(i)]
+
 if __name__ == '__main__':
     # test 1 (should work)
     prvkey = dumb25519.random_scalar()
@@ -103,3 +144,22 @@ if __name__ == '__main__':
         # print("Something's wrong :(")
     # else:
         # print("Prover you're desperate!")
+
+    # test 3: batch verification (once NISchnorrProof works)
+    # how much faster is batch_verify() than calling verify() on each proof?
+    # for n in [1, 4, 16, 64, 256]:
+        # proofs = []
+        # for i in range(n):
+            # prvkey = dumb25519.random_scalar()
+            # proofs.append(NISchnorrProof(prvkey, prvkey * dumb25519.G))
+        # start = time.perf_counter()   # (import time first)
+        # serial = all(proof.verify() for proof in proofs)
+        # serial_time = time.perf_counter() - start
+        # start = time.perf_counter()
+        # bad = batch_verify(proofs)
+        # batch_time = time.perf_counter() - start
+        # print(f"{ n } proofs: serial { serial_time:.4f}s, batch { batch_time:.4f}s, speedup { serial_time / batch_time:.1f}x")
+
+    # now break one proof and see if batch_verify() catches it
+    # proofs[3].s += Scalar(1)
+    # print("Invalid proofs:", batch_verify(proofs))
@@ -81,6 +81,7 @@ for i in range(dumb25519.cofactor):
     ki_list.append(ki_new)
 
 # Are they unique to each other?
+# (a dumb25519.KeyImageIndex would not be fooled: it keys every key image by 8 times the key image)
 ki_set = set([str(i) for i in ki_list])
 print(f'Distinct key images: { len(ki_set) }\n')
 
@@ -113,6 +114,7 @@ if len(prod_set) == 1:
 #
 # Note: use dumb25519.Scalar('l') for (main subgroup) order 'l'. I know I know, 'l' is technically
 # NOT a Scalar, but that's where the first four letters of "dumb25519" come in :D
+# (once yours works, compare with Point.is_torsion_free(), and PointVector.torsion_free_mask() for many key images)
 
 # check_condition = lambda point: <your code here>   # check_condition : point -> boolean
 
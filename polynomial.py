@@ -0,0 +1,75 @@
+# Polynomials over the scalar field of dumb25519, for things like Shamir secret sharing
+#
+# A polynomial is a ScalarVector of coefficients, lowest degree first: coeff[i] goes with x**i
+# Use this code only for prototyping, just like dumb25519
+
+import sys
+from dumb25519 import Scalar, ScalarVector, LRUCache, l, reduced, scalar_vector
+
+# Evaluate a polynomial at x using Horner's rule
+def evaluate(coeff,x):
+    if not isinstance(coeff,ScalarVector) or not isinstance(x,Scalar):
+        raise TypeError
+    result = 0
+    y = x.x
+    for c in reversed(coeff.values):
+        result = (result*y + c) % l
+    return reduced(result)
+
+# Evaluate a polynomial at each of a ScalarVector (or list) of points, returning a ScalarVector
+# Horner's rule runs for all the points at once, one coefficient at a time
+def evaluate_many(coeff,xs):
+    if isinstance(xs,list):
+        xs = ScalarVector(xs)
+    if not isinstance(coeff,ScalarVector) or not isinstance(xs,ScalarVector):
+        raise TypeError
+    points = xs.values
+    results = [0]*len(points)
+    for c in reversed(coeff.values):
+        results = [(result*y + c) % l for result,y in zip(results,points)]
+    return scalar_vector(results)
+
+# Lagrange weights at zero for a list of distinct nonzero points, keyed by their encodings
+# Each set of weights takes about 100 bytes per point, so the default capacity holds a few tens of
+# thousands of points' worth of participant sets
+lagrange_cache = LRUCache(4*2**20)
+
+# Weights w such that the polynomial of degree < len(xs) through (xs[i],ys[i]) has the value w ** ys at zero
+# With barycentric denominators d[i] = -xs[i] * prod(xs[i] - xs[j] for j != i), the weights are
+# prod(-xs[j]) / d[i], so there is a single batch inversion (ScalarVector.invert) of all the d[i]
+# Weights are cached per (ordered) participant set in lagrange_cache
+# Raises ZeroDivisionError if a point is zero or repeated
+def lagrange_weights(xs):
+    if isinstance(xs,list):
+        xs = ScalarVector(xs)
+    if not isinstance(xs,ScalarVector):
+        raise TypeError
+    key = xs.to_buffer()
+    weights = lagrange_cache.get(key)
+    if weights is not None:
+        return weights[:]
+
+    points = xs.values
+    denominators = []
+    numerator = 1
+    for i in range(len(points)):
+        denominator = -points[i]
+        for j in range(len(points)):
+            if j != i:
+                denominator = (denominator*(points[i] - points[j])) % l
+        denominators.append(denominator)
+        numerator = (numerator*-points[i]) % l
+    weights = scalar_vector(denominators).invert()*reduced(numerator)
+
+    lagrange_cache.put(key,weights,sys.getsizeof(key) + sys.getsizeof(weights.values) + sum(sys.getsizeof(w) for w in weights.values))
+    return weights[:]
+
+# The value at zero of the polynomial through a list of (x,y) Scalar pairs, such as the secret of a Shamir sharing
+def interpolate_at_zero(coords):
+    for coord in coords:
+        if len(coord) != 2 or not isinstance(coord[0],Scalar) or not isinstance(coord[1],Scalar):
+            raise TypeError
+    if len(coords) == 0:
+        return Scalar(0)
+    weights = lagrange_weights([x for x,y in coords])
+    return weights ** ScalarVector([y for x,y in coords])